@@ -1,11 +1,18 @@
 #!/usr/bin/python3.10
+import logging
 import sys
-from weather import *
 
-VALID_ARGS = ('daily', 'hourly', 'nightly', )
+# Maps each valid argument to the name of the WeatherAssistant method it executes
+VALID_ARGS = {
+    'daily': 'exec_daily',
+    'hourly': 'exec_hourly',
+    'morning': 'exec_morning',
+    'nightly': 'exec_nightly',
+    'serve': 'run_forever',
+}
 
 HELP_MESSAGE = (">>> python run.py <arg>\nValid args:\n" +
-                '\n'.join(f'--{arg}' for arg in VALID_ARGS))
+                '\n'.join(f'--{arg}' for arg in sorted(VALID_ARGS)))
 
 
 def main(argv: list[str]) -> None:
@@ -16,17 +23,17 @@ def main(argv: list[str]) -> None:
         sys.exit(2)
     # Parse & validate argument
     arg = argv[0].removeprefix('--')
-    if arg not in VALID_ARGS:
+    method_name = VALID_ARGS.get(arg)
+    if method_name is None:
         print(f"Invalid Argument: {arg}", HELP_MESSAGE, sep='\n')
         sys.exit(2)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger('twilio').setLevel(logging.WARNING)   # logs every request at INFO
+    # Deferred so that invalid invocations don't pay for importing requests/twilio
+    from weather import WeatherAssistant
     # Execute weather check
-    assistant = WeatherAssistant()
-    if arg == 'daily':
-        assistant.exec_daily()
-    elif arg == 'hourly':
-        assistant.exec_hourly()
-    elif arg == 'nightly':
-        assistant.exec_nightly()
+    getattr(WeatherAssistant(), method_name)()
 
 
 if __name__ == "__main__":
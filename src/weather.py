@@ -1,12 +1,105 @@
 # This file contains all of the code for interacting with AccuWeather API.
 # Reference: https://developer.accuweather.com/apis
+import hashlib
+import logging
+import orjson
 import requests
+import time
 from collections import namedtuple
-from os import environ as OS_ENVIRON
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from operator import itemgetter
+from os import environ as OS_ENVIRON, getpid
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
+from urllib.parse import urlencode
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
 
 Location = namedtuple('Location', ['key', 'name'])
 
+ENV_VAR_ERROR_MSG = "Env. variable(s) {} not found. Make sure they have been set in the current environment."
+
+REQUIRED_ENV_VARS = ('ACCUWEATHER_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN',
+                     'FROM_PHONE_NUMBER', 'TO_PHONE_NUMBER')
+
+
+@dataclass(frozen=True, slots=True)
+class _Env:
+    """Credentials read from REQUIRED_ENV_VARS (same order)."""
+    api_key: str
+    account_id: str
+    auth_token: str
+    from_number: str
+    to_number: str
+
+
+# Credentials are read once per process (fails fast at import, listing every missing variable)
+_missing = [var for var in REQUIRED_ENV_VARS if var not in OS_ENVIRON]
+if _missing:
+    raise KeyError(ENV_VAR_ERROR_MSG.format(', '.join(map(repr, _missing))))
+_ENV = _Env(*itemgetter(*REQUIRED_ENV_VARS)(OS_ENVIRON))
+
+# Notification templates used by WeatherAssistant
+HOURLY_RAIN_TEMPLATE = "{loc}: {intensity} {ptype} expected over the next hour."
+DAILY_RAIN_TEMPLATE = "{intensity} {ptype} expected for {hours} hours."
+DAILY_TEMPLATE = "Today's forecast for {loc}: {desc}. High of {high} degrees.{precip}"
+NIGHTLY_TEMPLATE = "Tonight's forecast for {loc}: {desc}. Low of {low} degrees.{precip}"
+
+# Responses are cached on disk so that separate cron runs can share them.
+CACHE_DIR = Path(OS_ENVIRON.get('WEATHER_CACHE_DIR', '~/.cache/weather-assistant')).expanduser()
+# Cache lifetimes (seconds) for each endpoint
+HOURLY_TTL = 1800
+DAILY_TTL = 10800
+LOCATION_TTL = 31_536_000   # location keys are stable, so keep them for a year
+
+# Shared session; keeps the connection to AccuWeather alive between requests.
+_SESSION = requests.Session()
+_SESSION.headers.update({'Accept-Encoding': ACCEPT_ENCODING})   # includes br if brotli is installed
+_ADAPTER = HTTPAdapter(
+    pool_connections=4, pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.3,
+                      status_forcelist=[429, 500, 502, 503, 504])
+)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.mount('https://', _ADAPTER)
+# Request timeouts (seconds): (connect, read)
+_TIMEOUT = (3.05, 8)
+
+# Retries for Twilio requests. Sending an SMS is a POST, so only retry when it's
+# certain the message wasn't sent: failed connections & rate limiting (429).
+_TWILIO_RETRY = Retry(total=3, read=0, backoff_factor=0.5, status_forcelist=[429],
+                      allowed_methods=None, raise_on_status=False)
+
+
+def _cached_get(url: str, params: dict, ttl: int):
+    """Returns the decoded JSON response for a GET request. Responses are cached
+    on disk (keyed by URL & params) and reused until they are ttl seconds old."""
+    key = hashlib.blake2b((url + urlencode(sorted(params.items()))).encode(),
+                          digest_size=16).hexdigest()
+    path = CACHE_DIR / f'{key}.json'
+    try:
+        if time.time() - path.stat().st_mtime < ttl:
+            return orjson.loads(path.read_bytes())
+    except (OSError, ValueError):
+        pass    # missing, unreadable or corrupt cache entry; fetch a fresh copy
+    response = _SESSION.get(url=url, params=params, timeout=_TIMEOUT)
+    response.raise_for_status()
+    content = response.content
+    try:    # caching is best-effort
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{getpid()}.tmp')
+        tmp_path.write_bytes(content)
+        tmp_path.replace(path)
+    except OSError:
+        pass
+    return orjson.loads(content)
+
 
 def location_key_search(api_key: str, **kwargs) -> Location:
     """Calls AccuWeather location search API using the given query string
@@ -18,101 +111,130 @@ def location_key_search(api_key: str, **kwargs) -> Location:
         kw, arg = kw, arg
     # Match URL to keyword
     if kw == 'text_search':
-        request_url = 'http://dataservice.accuweather.com/locations/v1/cities/search'
+        request_url = 'https://dataservice.accuweather.com/locations/v1/cities/search'
+        # Normalize so that equivalent queries share a cache entry
+        arg = ' '.join(arg.lower().split())
     elif kw == 'coord_search':
-        request_url = 'http://dataservice.accuweather.com/locations/v1/cities/geoposition/search'
+        request_url = 'https://dataservice.accuweather.com/locations/v1/cities/geoposition/search'
     else:
         raise TypeError(
             f"Valid keywords are: {', '.join('text_search', 'coord_search')}.")
     # Make request
     params = {'q': arg, 'apikey': api_key}
-    response = requests.get(url=request_url, params=params)
-    json = response.json()
+    response_json = _cached_get(request_url, params, LOCATION_TTL)
     # If JSON is list, the text_search API was called; take the top result.
-    if isinstance(json, list):
-        result = json[0]
+    if isinstance(response_json, list):
+        result = response_json[0]
     # Otherwise, coord_search API was called (returns 1 result as dict)
     else:
-        result = json
+        result = response_json
 
     return Location(result['Key'], result['LocalizedName'])
 
 
 class WeatherAssistant:
-    def __init__(self, location_string: str = None):
+    # Private names are mangled here just as they are in method bodies
+    __slots__ = ('__env', 'location', '_location_upper', '_twilio', '_daily_forecast',
+                 'hourly_ttl', 'daily_ttl')
+
+    # Hours (local time) at which run_forever executes each check
+    HOURLY_HOURS = frozenset(range(8, 19))
+    DAILY_HOUR = 7
+    NIGHTLY_HOUR = 19
+
+    def __init__(self, location_string: str = None,
+                 hourly_ttl: int = HOURLY_TTL, daily_ttl: int = DAILY_TTL):
         """
         A class with methods for periodic weather monitoring and notifications.
 
         If a string is passed to init, location is retrieved from AccuWeather search API.
         If nothing is passed, location is set from environment variables.
+        hourly_ttl & daily_ttl set how long (in seconds) cached forecasts are reused.
         """
+        self.hourly_ttl = hourly_ttl
+        self.daily_ttl = daily_ttl
+        self.__env = _ENV
+        self._twilio = None
+        self._daily_forecast = None
         try:
-            self.__api_key = OS_ENVIRON['ACCUWEATHER_API_KEY']
-            self.__account_id = OS_ENVIRON['TWILIO_ACCOUNT_SID']
-            self.__auth_token = OS_ENVIRON['TWILIO_AUTH_TOKEN']
-            self.__from = OS_ENVIRON['FROM_PHONE_NUMBER']
-            self.__to = OS_ENVIRON['TO_PHONE_NUMBER']
             if location_string is None:
                 self.location = location_key_search(
-                    self.__api_key, coord_search=OS_ENVIRON['DEFAULT_LOCATION'])
+                    self.__env.api_key, coord_search=OS_ENVIRON['DEFAULT_LOCATION'])
             else:
                 self.location = location_key_search(
-                    self.__api_key, text_search=location_string)
+                    self.__env.api_key, text_search=location_string)
 
         except KeyError as e:
-            env_var_error_msg = f"Env. variable {str(e)} not found. Make sure it has been set in the current environment."
-            raise KeyError(env_var_error_msg) from e
+            raise KeyError(ENV_VAR_ERROR_MSG.format(str(e))) from e
+        self._location_upper = self.location.name.upper()
 
     def get_hourly_forecast(self, n: int, details: bool = False) -> list[dict]:
         """Returns a list of hourly forecasts for the next n hours (n must be either 1 or 12)."""
         if n not in (1, 12):
             raise ValueError("n must be 1 or 12.")
-        request_url = f"http://dataservice.accuweather.com/forecasts/v1/hourly/{n}hour/{self.location.key}"
-        params = {'apikey': self.__api_key, 'details': details}
-        response = requests.get(url=request_url, params=params)
+        request_url = f"https://dataservice.accuweather.com/forecasts/v1/hourly/{n}hour/{self.location.key}"
+        params = {'apikey': self.__env.api_key, 'details': details}
         # JSON structure: ../examples/http_responses/hourly
-        return response.json()
+        return _cached_get(request_url, params, self.hourly_ttl)
 
     def get_daily_forecast(self, details: bool = False) -> dict:
         """Returns the daily forecast for one day."""
-        request_url = f"http://dataservice.accuweather.com/forecasts/v1/daily/1day/{self.location.key}"
-        params = {'apikey': self.__api_key, 'details': details}
-        response = requests.get(url=request_url, params=params)
+        request_url = f"https://dataservice.accuweather.com/forecasts/v1/daily/1day/{self.location.key}"
+        params = {'apikey': self.__env.api_key, 'details': details}
         # JSON structure: ../examples/http_responses/daily
-        return response.json()
+        return _cached_get(request_url, params, self.daily_ttl)
+
+    def _daily(self) -> dict:
+        """Returns today's detailed daily forecast, fetched once per instance."""
+        if self._daily_forecast is None:
+            self._daily_forecast = self.get_daily_forecast(details=True)['DailyForecasts'][0]
+        return self._daily_forecast
+
+    def get_bundle(self, n: int = 12, hourly_details: bool = False,
+                   daily_details: bool = False) -> dict:
+        """Fetches the n-hour and daily forecasts concurrently and returns
+        them as a dict with keys 'hourly' and 'daily'."""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            hourly = executor.submit(self.get_hourly_forecast, n, hourly_details)
+            daily = executor.submit(self.get_daily_forecast, daily_details)
+            return {'hourly': hourly.result(), 'daily': daily.result()}
 
     def rain_check(self, forecast: dict, hourly: bool) -> str:
         """Takes a day/night/hour forecast (dict-like) as input. Returns a
         notification if precipitation is expected, and an empty string otherwise.
         The 'hourly' param dictates the wording of the returned notification."""
-        msg = ''
-        if forecast['HasPrecipitation']:
-            msg = "{} {} expected".format(
-                forecast['PrecipitationIntensity'],
-                forecast['PrecipitationType'].lower()
-            )
-            if hourly:   # form entire msg for self.exec_hourly
-                msg = f"{self.location.name.upper()}: " + msg
-                msg += " over the next hour."
-            else:        # part of a greater daily/nightly notification
-                msg += f" for {forecast['HoursOfPrecipitation']} hours."
-
-        return msg
+        if not forecast['HasPrecipitation']:
+            return ''
+        intensity = forecast['PrecipitationIntensity']
+        ptype = forecast['PrecipitationType'].lower()
+        if hourly:   # form entire msg for self.exec_hourly
+            return HOURLY_RAIN_TEMPLATE.format(loc=self._location_upper,
+                                               intensity=intensity, ptype=ptype)
+        # part of a greater daily/nightly notification
+        return DAILY_RAIN_TEMPLATE.format(intensity=intensity, ptype=ptype,
+                                          hours=forecast['HoursOfPrecipitation'])
+
+    @property
+    def twilio(self) -> Client:
+        """Twilio client, created on first use and reused afterwards."""
+        if self._twilio is None:
+            # Twilio's client only takes a single timeout (used for both connect & read)
+            http_client = TwilioHttpClient(timeout=_TIMEOUT[1], max_retries=_TWILIO_RETRY)
+            self._twilio = Client(self.__env.account_id, self.__env.auth_token, http_client=http_client)
+        return self._twilio
 
     def send_sms(self, message: str) -> None:
         """Sends the given string as an SMS message through Twilio."""
-        client = Client(self.__account_id, self.__auth_token)
-        sms = client.messages.create(
+        sms = self.twilio.messages.create(
             body=message,
-            from_=self.__from,
-            to=self.__to
+            from_=self.__env.from_number,
+            to=self.__env.to_number
         )
-        # TODO: Better way to log message status
-        print(f'Sent: {sms.date_created}')
+        logger.info("Sent SMS sid=%s at %s (status: %s)", sms.sid, sms.date_created, sms.status)
 
     def exec_hourly(self) -> None:
         """Executed hourly — checks the next hour for precipitation and sends a notification if expected."""
-        forecast = self.get_hourly_forecast(1, details=True)[0]
+        forecast = self.get_hourly_forecast(1)[0]
         # Check precipitation
         msg = self.rain_check(forecast, hourly=True)
         if msg:
@@ -120,32 +242,65 @@ class WeatherAssistant:
 
     def exec_daily(self) -> None:
         """Executed daily (in the morning) — generates a forecast summary and sends as a SMS message."""
-        forecast = self.get_daily_forecast(details=True)['DailyForecasts'][0]
-        msg = [f"Today's forecast for {self.location.name}:"]
-        # Forecast description
-        msg.append(forecast['Day']['LongPhrase'] + '.')
-        # Check high temp
-        high = int(forecast['Temperature']['Maximum']['Value'])
-        msg.append(f'High of {high} degrees.')
-        # Check for precipitation
-        precip_msg = self.rain_check(forecast['Day'], hourly=False)
+        self.send_sms(self._daily_summary())
+
+    def exec_morning(self) -> None:
+        """Combines exec_daily & exec_hourly into one SMS message, fetching both
+        forecasts concurrently (for when both checks are scheduled together)."""
+        bundle = self.get_bundle(1, daily_details=True)
+        self._daily_forecast = bundle['daily']['DailyForecasts'][0]
+        msg = self._daily_summary()
+        # Check the next hour for precipitation
+        precip_msg = self.rain_check(bundle['hourly'][0], hourly=True)
         if precip_msg:
-            msg.append(precip_msg)
+            msg = f'{msg} {precip_msg}'
+
+        self.send_sms(msg)
 
-        self.send_sms(' '.join(msg))
+    def _daily_summary(self) -> str:
+        """Returns the daily forecast summary sent by exec_daily."""
+        forecast = self._daily()
+        precip_msg = self.rain_check(forecast['Day'], hourly=False)
+        return DAILY_TEMPLATE.format(
+            loc=self.location.name,
+            desc=forecast['Day']['LongPhrase'],
+            high=round(forecast['Temperature']['Maximum']['Value']),
+            precip=f' {precip_msg}' if precip_msg else ''
+        )
 
     def exec_nightly(self) -> None:
         """Generates a nightly forecast summary and sends as a SMS message (similar to exec_daily)."""
-        forecast = self.get_daily_forecast(details=True)['DailyForecasts'][0]
-        msg = [f"Tonight's forecast for {self.location.name}:"]
-        # Description
-        msg.append(forecast['Night']['LongPhrase'] + '.')
-        # Check low temp
-        low = int(forecast['Temperature']['Minimum']['Value'])
-        msg.append(f'Low of {low} degrees.')
-        # Check precipitation
+        forecast = self._daily()
         precip_msg = self.rain_check(forecast['Night'], hourly=False)
-        if precip_msg:
-            msg.append(precip_msg)
+        self.send_sms(NIGHTLY_TEMPLATE.format(
+            loc=self.location.name,
+            desc=forecast['Night']['LongPhrase'],
+            low=round(forecast['Temperature']['Minimum']['Value']),
+            precip=f' {precip_msg}' if precip_msg else ''
+        ))
 
-        self.send_sms(' '.join(msg))
+    def run_forever(self) -> None:
+        """Runs the checks on the hours set by the class attributes above, in one
+        long-lived process (an alternative to cron that reuses the HTTP session
+        and Twilio client between runs)."""
+        while True:
+            # Sleep until the top of the next hour
+            now = datetime.now()
+            next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+            time.sleep((next_hour - now).total_seconds())
+            # Today's forecast may have changed since the last check
+            self._daily_forecast = None
+            checks = []
+            if next_hour.hour == self.DAILY_HOUR and next_hour.hour in self.HOURLY_HOURS:
+                checks.append(self.exec_morning)
+            elif next_hour.hour == self.DAILY_HOUR:
+                checks.append(self.exec_daily)
+            elif next_hour.hour in self.HOURLY_HOURS:
+                checks.append(self.exec_hourly)
+            if next_hour.hour == self.NIGHTLY_HOUR:
+                checks.append(self.exec_nightly)
+            for check in checks:
+                try:
+                    check()
+                except Exception:   # a failed check shouldn't stop the schedule
+                    logger.exception("%s failed", check.__name__)